@@ -132,7 +132,7 @@ class RPCConnection(AgentConnection):
 
     def send_command(self, cmd: dict) -> None:
         if self._process and self._process.stdin:
-            line = json.dumps(cmd) + "\n"
+            line = json.dumps(cmd, separators=(",", ":")) + "\n"
             self._process.stdin.write(line.encode("utf-8"))
             # Note: drain is async, but we fire-and-forget here
             if self._loop:
@@ -140,9 +140,10 @@ class LemonApp:
                         text_parts = []
                         thinking_parts = []
                         for b in (blocks if isinstance(blocks, list) else []):
-                            if b.get("type") == "text":
+                            btype = b.get("type")
+                            if btype == "text":
                                 text_parts.append(b.get("text", ""))
-                            elif b.get("type") == "thinking":
+                            elif btype == "thinking":
                                 thinking_parts.append(b.get("thinking", ""))
                         if thinking_parts and self._store.state.show_thinking:
                             from lemon_cli.display.panels import render_thinking_panel
@@ -1,3 +1,5 @@
+from dataclasses import asdict
+
 from lemon_cli.tui.overlays.base import OverlayBase
 from lemon_cli.tui.overlays.select import SelectOverlay
 from lemon_cli.tui.overlays.confirm import ConfirmOverlay
@@ -13,7 +15,7 @@ def handle_ui_request(request, app) -> dict | None:
     if isinstance(params, dict):
         params_dict = params
     else:
-        params_dict = {k: v for k, v in vars(params).items() if not k.startswith("_")}
+        params_dict = asdict(params)
 
     if method == "select":
         overlay = SelectOverlay(params_dict)
@@ -9,7 +9,7 @@ from typing import Any, Union
 # Primitive / shared types
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class ModelInfo:
     provider: str
     id: str
@@ -26,7 +26,7 @@ class ModelInfo:
 # Usage
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class UsageCost:
     input: float = 0.0
     output: float = 0.0
@@ -45,7 +45,7 @@ class UsageCost:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Usage:
     input: int = 0
     output: int = 0
@@ -71,7 +71,7 @@ class Usage:
 # Content blocks
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class TextContent:
     type: str  # "text"
     text: str
@@ -86,7 +86,7 @@ class TextContent:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ThinkingContent:
     type: str  # "thinking"
     thinking: str
@@ -101,7 +101,7 @@ class ThinkingContent:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolCall:
     type: str  # "tool_call"
     id: str
@@ -118,7 +118,7 @@ class ToolCall:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageContent:
     type: str  # "image"
     data: str
@@ -153,7 +153,7 @@ def parse_content_block(data: dict) -> ContentBlock:
 # Message types (from AgentCore)
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class UserMessage:
     role: str  # "user"
     content: str | list[ContentBlock]
@@ -171,7 +171,7 @@ class UserMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AssistantMessage:
     role: str  # "assistant"
     content: list[ContentBlock]
@@ -202,7 +202,7 @@ class AssistantMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolResultMessage:
     role: str  # "tool_result"
     tool_call_id: str
@@ -251,7 +251,7 @@ def parse_message(data: dict) -> Message:
 # UI request params
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class SelectOption:
     label: str
     value: str
@@ -266,7 +266,7 @@ class SelectOption:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SelectParams:
     title: str
     options: list[SelectOption]
@@ -281,7 +281,7 @@ class SelectParams:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ConfirmParams:
     title: str
     message: str
@@ -296,7 +296,7 @@ class ConfirmParams:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class InputParams:
     title: str
     placeholder: str | None = None
@@ -311,7 +311,7 @@ class InputParams:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class EditorParams:
     title: str
     prefill: str | None = None
@@ -346,7 +346,7 @@ def parse_ui_params(method: str, params: dict) -> UIParams:
 # Session info
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class SessionInfo:
     path: str
     id: str
@@ -365,7 +365,7 @@ class SessionInfo:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class RunningSessionInfo:
     session_id: str
     cwd: str
@@ -382,7 +382,7 @@ class RunningSessionInfo:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionStats:
     session_id: str
     message_count: int
@@ -405,7 +405,7 @@ class SessionStats:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ProviderModel:
     id: str
     name: str
@@ -418,7 +418,7 @@ class ProviderModel:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ProviderInfo:
     id: str
     models: list[ProviderModel]
@@ -435,7 +435,7 @@ class ProviderInfo:
 # Session event
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class SessionEvent:
     type: str
     data: list[Any] | None = None
@@ -452,7 +452,7 @@ class SessionEvent:
 # Server messages
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class ReadyMessage:
     type: str  # "ready"
     cwd: str
@@ -475,7 +475,7 @@ class ReadyMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class EventMessage:
     type: str  # "event"
     session_id: str
@@ -492,7 +492,7 @@ class EventMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionStartedMessage:
     type: str  # "session_started"
     session_id: str
@@ -509,7 +509,7 @@ class SessionStartedMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionClosedMessage:
     type: str  # "session_closed"
     session_id: str
@@ -524,7 +524,7 @@ class SessionClosedMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ActiveSessionMessage:
     type: str  # "active_session"
     session_id: str | None
@@ -537,7 +537,7 @@ class ActiveSessionMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StatsMessage:
     type: str  # "stats"
     session_id: str
@@ -552,7 +552,7 @@ class StatsMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionsListMessage:
     type: str  # "sessions_list"
     sessions: list[SessionInfo]
@@ -567,7 +567,7 @@ class SessionsListMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class RunningSessionsMessage:
     type: str  # "running_sessions"
     sessions: list[RunningSessionInfo]
@@ -582,7 +582,7 @@ class RunningSessionsMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ModelsListMessage:
     type: str  # "models_list"
     providers: list[ProviderInfo]
@@ -597,7 +597,7 @@ class ModelsListMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class UIRequestMessage:
     type: str  # "ui_request"
     id: str
@@ -616,7 +616,7 @@ class UIRequestMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class UISignalMessage:
     type: str  # "ui_notify", "ui_status", etc.
     params: dict = field(default_factory=dict)
@@ -629,7 +629,7 @@ class UISignalMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SaveResultMessage:
     type: str  # "save_result"
     ok: bool
@@ -646,12 +646,12 @@ class SaveResultMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PongMessage:
     type: str = "pong"
 
 
-@dataclass
+@dataclass(slots=True)
 class DebugMessage:
     type: str  # "debug"
     message: str
@@ -666,7 +666,7 @@ class DebugMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ErrorMessage:
     type: str  # "error"
     message: str
@@ -681,7 +681,7 @@ class ErrorMessage:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class UnknownMessage:
     type: str
     raw: dict = field(default_factory=dict)
@@ -0,0 +1,42 @@
+"""ui_request dispatch tests for parsed (dataclass-backed) requests."""
+from types import SimpleNamespace
+
+
+def test_confirm_ui_request_from_dataclass_params():
+    from lemon_cli.tui.overlays import handle_ui_request
+    from lemon_cli.types import UIRequestMessage
+
+    request = UIRequestMessage.from_dict(
+        {"method": "confirm", "params": {"title": "t", "message": "m"}}
+    )
+
+    assert handle_ui_request(request, SimpleNamespace()) == {"result": True, "error": None}
+
+
+def test_input_ui_request_from_dataclass_params():
+    from lemon_cli.tui.overlays import handle_ui_request
+    from lemon_cli.types import UIRequestMessage
+
+    request = UIRequestMessage.from_dict(
+        {"method": "input", "params": {"title": "Name", "placeholder": "..."}}
+    )
+
+    assert handle_ui_request(request, SimpleNamespace()) == {"result": "", "error": None}
+
+
+def test_select_ui_request_from_dataclass_params():
+    from lemon_cli.tui.overlays import handle_ui_request
+    from lemon_cli.types import UIRequestMessage
+
+    request = UIRequestMessage.from_dict({
+        "method": "select",
+        "params": {
+            "title": "Pick",
+            "options": [
+                {"label": "First", "value": "one"},
+                {"label": "Second", "value": "two"},
+            ],
+        },
+    })
+
+    assert handle_ui_request(request, SimpleNamespace()) == {"result": "one", "error": None}
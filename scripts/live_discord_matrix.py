@@ -1,13 +1,16 @@
 #!/usr/bin/env -S uv run
 # /// script
+# requires-python = ">=3.11"
 # dependencies = ["websockets>=12.0"]
 # ///
 
 import argparse
 import asyncio
+from collections import Counter
 from datetime import datetime, timezone
 import json
 import os
+import re
 import subprocess
 import time
 import urllib.error
@@ -25,9 +28,13 @@ API_BASE = "https://discord.com/api/v10"
 BOT_TOKEN_KEYS = {"bot_token", "discord_bot_token", "discord_bot", "bot", "token"}
 GATEWAY_MESSAGE_CONTENT = 1 << 18
 GATEWAY_MESSAGE_CONTENT_LIMITED = 1 << 19
+CONTROL_PLANE_TIMEOUT_S = 20
+THREAD_REPLY_RE = re.compile(r"alive|operational|working", re.IGNORECASE)
 
 
 class Check:
+    __slots__ = ("run", "sender", "peer_kind", "channel_id")
+
     def __init__(self, run, sender, peer_kind="group", channel_id=None):
         self.run = run
         self.sender = sender
@@ -328,10 +335,10 @@ def run_slash_client_click_proof_wait(args, token, identity):
             flush=True,
         )
 
-    deadline = time.time() + args.timeout
+    deadline = time.monotonic() + args.timeout
     last_check = None
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         check = run_slash_client_click_proof_check(args.slash_client_click_proof_path)
         check["name"] = "discord_slash_client_click_proof_wait"
         check["proof_scope"] = "Discord slash client-click proof wait"
@@ -406,8 +413,9 @@ def now_iso():
 
 def sanitized_live_proof(result):
     checks = [sanitized_check(check) for check in result.get("checks", [])]
-    completed_count = sum(1 for check in checks if check["status"] == "completed")
-    failed_count = sum(1 for check in checks if check["status"] == "failed")
+    status_counts = Counter(check["status"] for check in checks)
+    completed_count = status_counts["completed"]
+    failed_count = status_counts["failed"]
 
     return {
         "generated_at": now_iso(),
@@ -848,11 +856,7 @@ def create_thread(token, channel_id, name):
 
 
 def find_message(messages, predicate):
-    for message in messages:
-        if predicate(message):
-            return message
-
-    return None
+    return next((message for message in messages if predicate(message)), None)
 
 
 def validate_kanban_command(command):
@@ -1044,11 +1048,11 @@ def run_restart_seed(token, channel_id, bot_id, timeout_s, sender=None):
 
 def run_restart_verify(token, channel_id, bot_id, timeout_s, restart_nonce, restart_reply_id, sender=None):
     duplicate_window_s = min(timeout_s, 30)
-    duplicate_deadline = time.time() + duplicate_window_s
+    duplicate_deadline = time.monotonic() + duplicate_window_s
     duplicates = []
     matched = []
 
-    while time.time() < duplicate_deadline:
+    while time.monotonic() < duplicate_deadline:
         recent = get_messages(token, channel_id, limit=100)
         matched = [
             summarize_message(message)
@@ -1443,7 +1447,7 @@ def run_user_prompt_check(
     validator,
     sender=None,
 ):
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     user_message = None
     bot_result = None
     recent = []
@@ -1479,7 +1483,7 @@ def run_user_prompt_check(
             flush=True,
         )
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         recent = get_messages(token, channel_id, limit=50)
 
         if user_message is None:
@@ -1563,48 +1567,51 @@ def discord_session_key(args, channel_id, sender, peer_kind="group"):
 async def reset_session_ws(ws_url, session_key):
     import websockets
 
-    async with websockets.connect(ws_url) as ws:
-        await ws.send(
-            json.dumps(
-                {
-                    "type": "req",
-                    "id": str(uuid.uuid4()),
-                    "method": "connect",
-                    "params": {
-                        "role": "operator",
-                        "scopes": ["operator.admin"],
-                        "client": {"id": "lemon-discord-matrix"},
-                    },
-                }
+    try:
+        async with asyncio.timeout(CONTROL_PLANE_TIMEOUT_S), websockets.connect(ws_url) as ws:
+            await ws.send(
+                json.dumps(
+                    {
+                        "type": "req",
+                        "id": str(uuid.uuid4()),
+                        "method": "connect",
+                        "params": {
+                            "role": "operator",
+                            "scopes": ["operator.admin"],
+                            "client": {"id": "lemon-discord-matrix"},
+                        },
+                    }
+                )
             )
-        )
-        hello = json.loads(await ws.recv())
-
-        if hello.get("type") != "hello-ok":
-            raise SystemExit(f"control-plane connect failed: {json.dumps(hello)}")
-
-        request_id = str(uuid.uuid4())
-        await ws.send(
-            json.dumps(
-                {
-                    "type": "req",
-                    "id": request_id,
-                    "method": "sessions.reset",
-                    "params": {"sessionKey": session_key},
-                }
+            hello = json.loads(await ws.recv())
+
+            if hello.get("type") != "hello-ok":
+                raise SystemExit(f"control-plane connect failed: {json.dumps(hello)}")
+
+            request_id = str(uuid.uuid4())
+            await ws.send(
+                json.dumps(
+                    {
+                        "type": "req",
+                        "id": request_id,
+                        "method": "sessions.reset",
+                        "params": {"sessionKey": session_key},
+                    }
+                )
             )
-        )
 
-        while True:
-            response = json.loads(await ws.recv())
+            while True:
+                response = json.loads(await ws.recv())
 
-            if response.get("type") != "res" or response.get("id") != request_id:
-                continue
+                if response.get("type") != "res" or response.get("id") != request_id:
+                    continue
 
-            if response.get("ok") is not True:
-                raise SystemExit(f"control-plane sessions.reset failed: {json.dumps(response)}")
+                if response.get("ok") is not True:
+                    raise SystemExit(f"control-plane sessions.reset failed: {json.dumps(response)}")
 
-            return response
+                return response
+    except TimeoutError:
+        raise SystemExit(f"control-plane sessions.reset timed out after {CONTROL_PLANE_TIMEOUT_S}s")
 
 
 def maybe_reset_session(args, channel_id, sender, peer_kind="group"):
@@ -1760,10 +1767,7 @@ def validate_thread_reply(messages, bot_id, user_message):
         messages,
         lambda message: message.get("author", {}).get("id") == bot_id
         and message.get("timestamp", "") >= user_created
-        and any(
-            marker in (message.get("content") or "").lower()
-            for marker in ["alive", "operational", "working"]
-        ),
+        and THREAD_REPLY_RE.search(message.get("content") or "") is not None,
     )
 
     return {"ok": bot_reply is not None, "summary": summarize_message(bot_reply)}
@@ -2077,15 +2081,17 @@ def run_in_dm_channel(args, run_check):
 
 
 def write_result(args, result):
+    output = json.dumps(result, indent=2)
+
     if args.result_path:
         args.result_path.parent.mkdir(parents=True, exist_ok=True)
-        args.result_path.write_text(json.dumps(result, indent=2) + "\n")
+        args.result_path.write_text(output + "\n")
 
     if args.proof_path:
         args.proof_path.parent.mkdir(parents=True, exist_ok=True)
         args.proof_path.write_text(json.dumps(sanitized_live_proof(result), indent=2) + "\n")
 
-    print(json.dumps(result, indent=2))
+    print(output)
 
 
 def write_dm_setup_failure(args, identity, sender, reason):
@@ -1,10 +1,13 @@
 #!/usr/bin/env -S uv run
 # /// script
+# requires-python = ">=3.11"
 # dependencies = ["telethon>=1.41,<2"]
 # ///
 
 import argparse
 import asyncio
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime, timezone
 import hashlib
 import json
@@ -14,7 +17,7 @@ import subprocess
 import time
 from pathlib import Path
 
-from telethon import TelegramClient
+from telethon import TelegramClient, events
 from telethon.tl.types import MessageEntityBold, MessageEntityPre
 from telethon.sessions import StringSession
 
@@ -24,6 +27,14 @@ DEFAULT_BOT = "zeebot_lemon_bot"
 DEFAULT_GROUP = "-1003842984060"
 DEFAULT_TOPIC = 35
 DEFAULT_ISOLATION_TOPICS = [35, 16456]
+POLL_INTERVAL_S = 2
+MIN_FETCH_GAP_S = 0.5
+CANCEL_START_TIMEOUT_S = 30
+CANCEL_ACK_RE = re.compile(r"cancelling current run|cancell?ed", re.IGNORECASE)
+RUN_CANCELLED_RE = re.compile(r"run failed: user_requested", re.IGNORECASE)
+LONG_OUTPUT_FILLER_A = "alpha " * 520
+LONG_OUTPUT_FILLER_B = "bravo " * 520
+LONG_OUTPUT_FILLER_C = "charlie " * 360
 
 
 def load_env(path):
@@ -59,6 +70,56 @@ def build_client(cfg):
     )
 
 
+class Activity:
+    # Set when the bot posts or edits in a watched chat. Pollers wait on it
+    # between history fetches and share one fetch schedule.
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.next_fetch = 0.0
+
+
+@contextmanager
+def watch_activity(client, chats, sender):
+    activity = Activity()
+
+    async def on_activity(_event):
+        activity.event.set()
+
+    builders = [
+        events.NewMessage(chats=chats, from_users=sender, incoming=True),
+        events.MessageEdited(chats=chats, from_users=sender, incoming=True),
+    ]
+
+    for builder in builders:
+        client.add_event_handler(on_activity, builder)
+
+    try:
+        yield activity
+    finally:
+        client.remove_event_handler(on_activity)
+
+
+async def poll_pause(activity):
+    # Poll again as soon as the bot posts or edits in a watched chat; the
+    # interval is only a fallback for updates Telegram does not push to us.
+    try:
+        await asyncio.wait_for(activity.event.wait(), POLL_INTERVAL_S)
+    except asyncio.TimeoutError:
+        pass
+
+    activity.event.clear()
+
+    # Streaming replies edit many times a second and concurrent pollers share
+    # the event, so keep history fetches at least MIN_FETCH_GAP_S apart overall.
+    now = time.monotonic()
+    fetch_at = max(now, activity.next_fetch)
+    activity.next_fetch = fetch_at + MIN_FETCH_GAP_S
+
+    if fetch_at > now:
+        await asyncio.sleep(fetch_at - now)
+
+
 def entity_types(msg):
     return [type(entity).__name__ for entity in (msg.entities or [])]
 
@@ -74,18 +135,20 @@ def row_in_topic(row, expected_topic_id):
 
 
 def message_row(msg):
+    # Story reply headers carry no message ids, so the reply fields stay defensive.
     reply = msg.reply_to
+    file = msg.file
 
     return {
         "id": msg.id,
         "out": bool(msg.out),
         "text": msg.raw_text or "",
-        "reply_to_msg_id": getattr(reply, "reply_to_msg_id", None) if reply else None,
-        "reply_to_top_id": getattr(reply, "reply_to_top_id", None) if reply else None,
+        "reply_to_msg_id": getattr(reply, "reply_to_msg_id", None),
+        "reply_to_top_id": getattr(reply, "reply_to_top_id", None),
         "entity_types": entity_types(msg),
-        "has_document": bool(getattr(msg, "document", None)),
-        "has_photo": bool(getattr(msg, "photo", None)),
-        "file_name": getattr(getattr(msg, "file", None), "name", None),
+        "has_document": msg.document is not None,
+        "has_photo": msg.photo is not None,
+        "file_name": file.name if file else None,
     }
 
 
@@ -107,8 +170,9 @@ def safe_scope(value):
 
 def sanitized_live_proof(result):
     checks = [sanitized_check(check) for check in result.get("checks", [])]
-    completed_count = sum(1 for check in checks if check["status"] == "completed")
-    failed_count = sum(1 for check in checks if check["status"] == "failed")
+    status_counts = Counter(check["status"] for check in checks)
+    completed_count = status_counts["completed"]
+    failed_count = status_counts["failed"]
 
     return {
         "generated_at": now_iso(),
@@ -169,8 +233,25 @@ def sanitized_check(check):
     return {key: value for key, value in sanitized.items() if value is not None}
 
 
+def reply_matches(row, sent_id, nonce, expected_topic_id=None, expected_text=None):
+    if row["out"]:
+        return False
+
+    if row["reply_to_msg_id"] != sent_id and nonce not in row["text"]:
+        return False
+
+    if row["text"].startswith("Running"):
+        return False
+
+    if not row_in_topic(row, expected_topic_id):
+        return False
+
+    return expected_text is None or row["text"] == expected_text
+
+
 async def wait_for_reply(
     client,
+    activity,
     peer,
     sent_id,
     nonce,
@@ -178,43 +259,55 @@ async def wait_for_reply(
     expected_topic_id=None,
     expected_text=None,
 ):
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     last_rows = []
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         last_rows = []
 
-        async for msg in client.iter_messages(peer, limit=40):
+        for msg in await client.get_messages(peer, limit=40):
             row = message_row(msg)
             last_rows.append(row)
 
-            if row["out"]:
-                continue
+            if reply_matches(row, sent_id, nonce, expected_topic_id, expected_text):
+                return row
+
+        await poll_pause(activity)
 
-            if row["reply_to_msg_id"] != sent_id and nonce not in row["text"]:
-                continue
+    return {"error": "timeout", "recent": last_rows[:10]}
 
-            if row["text"].startswith("Running"):
-                continue
 
-            if not row_in_topic(row, expected_topic_id):
-                continue
+async def wait_for_replies(client, activity, peer, probes, timeout_s):
+    # One history fetch per poll serves every pending probe; each probe is a
+    # (sent_id, nonce, expected_topic_id, expected_text) tuple.
+    deadline = time.monotonic() + timeout_s
+    replies = {}
+    last_rows = []
 
-            if expected_text is not None and row["text"] != expected_text:
-                continue
+    while time.monotonic() < deadline:
+        last_rows = [message_row(msg) for msg in await client.get_messages(peer, limit=40)]
 
-            return row
+        for index, probe in enumerate(probes):
+            if index not in replies:
+                reply = next((row for row in last_rows if reply_matches(row, *probe)), None)
 
-        await asyncio.sleep(2)
+                if reply:
+                    replies[index] = reply
 
-    return {"error": "timeout", "recent": last_rows[:10]}
+        if len(replies) == len(probes):
+            break
+
+        await poll_pause(activity)
+
+    timeout = {"error": "timeout", "recent": last_rows[:10]}
+    return [replies.get(index, timeout) for index in range(len(probes))]
 
 
 async def collect_matching_messages(client, peer, sent_ids, nonce, limit=80, expected_topic_id=None):
     rows = []
     sent_ids = set(sent_ids if isinstance(sent_ids, list) else [sent_ids])
 
-    async for msg in client.iter_messages(peer, limit=limit):
+    for msg in await client.get_messages(peer, limit=limit):
         row = message_row(msg)
 
         if not row_in_topic(row, expected_topic_id):
@@ -226,12 +319,12 @@ async def collect_matching_messages(client, peer, sent_ids, nonce, limit=80, exp
     return rows
 
 
-async def run_dm(client, bot, timeout_s):
+async def run_dm(client, activity, bot, timeout_s):
     nonce = f"lemon-dm-{int(time.time())}"
     prompt = f"{nonce} DM matrix probe: reply with exactly OK {nonce}"
     sent = await client.send_message(bot, prompt)
     expected = f"OK {nonce}"
-    reply = await wait_for_reply(client, bot, sent.id, nonce, timeout_s, expected_text=expected)
+    reply = await wait_for_reply(client, activity, bot, sent.id, nonce, timeout_s, expected_text=expected)
 
     ok = reply.get("text") == expected
 
@@ -244,12 +337,12 @@ async def run_dm(client, bot, timeout_s):
     }
 
 
-async def run_topic(client, group, topic_id, timeout_s):
+async def run_topic(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-topic-{topic_id}-{int(time.time())}"
     prompt = f"{nonce} topic matrix probe: reply with exactly OK {nonce}"
     sent = await client.send_message(group, prompt, reply_to=topic_id)
     expected = f"OK {nonce}"
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id, expected)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id, expected)
 
     ok = reply.get("text") == expected and reply.get("reply_to_top_id") == topic_id
 
@@ -263,7 +356,48 @@ async def run_topic(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_cancel(client, group, topic_id, timeout_s):
+async def wait_for_command_start(client, activity, group, topic_id, sent_id, nonce, timeout_s):
+    # Cancel once the bot reports the sleep running rather than after a fixed
+    # delay; if no status shows up in time, cancel anyway and let the check judge.
+    deadline = time.monotonic() + timeout_s
+
+    while time.monotonic() < deadline:
+        rows = await collect_matching_messages(client, group, [sent_id], nonce, expected_topic_id=topic_id)
+
+        if any(not row["out"] and "sleep 60" in row["text"] for row in rows):
+            return True
+
+        await poll_pause(activity)
+
+    return False
+
+
+def classify_cancel_rows(matched, success_text):
+    cancel_ack = None
+    successful_completion_seen = []
+    command_started = False
+    cancelled_or_failed = False
+
+    for row in matched:
+        text = row["text"]
+        tool_status = text.startswith("working")
+
+        if CANCEL_ACK_RE.search(text):
+            cancel_ack = row
+
+        if text == success_text or (tool_status and "\n✓ sleep 60" in text):
+            successful_completion_seen.append(row)
+
+        if "sleep 60" in text:
+            command_started = True
+
+        if RUN_CANCELLED_RE.search(text) or (tool_status and "\n✗ sleep 60" in text):
+            cancelled_or_failed = True
+
+    return cancel_ack, successful_completion_seen, command_started, cancelled_or_failed
+
+
+async def run_topic_cancel(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-cancel-{topic_id}-{int(time.time())}"
     success_text = f"OK {nonce}"
     prompt = (
@@ -272,14 +406,25 @@ async def run_topic_cancel(client, group, topic_id, timeout_s):
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    await asyncio.sleep(6)
+    started_before_cancel = await wait_for_command_start(
+        client,
+        activity,
+        group,
+        topic_id,
+        sent.id,
+        nonce,
+        min(timeout_s, CANCEL_START_TIMEOUT_S),
+    )
     cancel = await client.send_message(group, "/cancel", reply_to=topic_id)
 
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     cancel_ack = None
     matched = []
+    successful_completion_seen = []
+    command_started = False
+    cancelled_or_failed = False
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         matched = await collect_matching_messages(
             client,
             group,
@@ -287,37 +432,16 @@ async def run_topic_cancel(client, group, topic_id, timeout_s):
             nonce,
             expected_topic_id=topic_id,
         )
+        ack, successful_completion_seen, command_started, cancelled_or_failed = classify_cancel_rows(
+            matched,
+            success_text,
+        )
+        cancel_ack = ack or cancel_ack
 
-        for row in matched:
-            text = row["text"].lower()
-
-            if "cancelling current run" in text or "cancelled" in text or "canceled" in text:
-                cancel_ack = row
-
-        successful_completion_seen = [
-            row
-            for row in matched
-            if row["text"] == success_text
-            or (row["text"].startswith("working") and "\n✓ sleep 60" in row["text"])
-        ]
-
-        if cancel_ack and not successful_completion_seen and time.time() >= deadline - min(timeout_s, 15):
+        if cancel_ack and not successful_completion_seen and time.monotonic() >= deadline - min(timeout_s, 15):
             break
 
-        await asyncio.sleep(2)
-
-    successful_completion_seen = [
-        row
-        for row in matched
-        if row["text"] == success_text
-        or (row["text"].startswith("working") and "\n✓ sleep 60" in row["text"])
-    ]
-    command_started = any("sleep 60" in row["text"] for row in matched)
-    cancelled_or_failed = any(
-        "run failed: user_requested" in row["text"].lower()
-        or (row["text"].startswith("working") and "\n✗ sleep 60" in row["text"])
-        for row in matched
-    )
+        await poll_pause(activity)
 
     ok = (
         cancel_ack is not None
@@ -334,6 +458,7 @@ async def run_topic_cancel(client, group, topic_id, timeout_s):
         "sent_id": sent.id,
         "cancel_id": cancel.id,
         "cancel_ack": cancel_ack,
+        "started_before_cancel": started_before_cancel,
         "command_started": command_started,
         "cancelled_or_failed": cancelled_or_failed,
         "successful_completion_seen": successful_completion_seen,
@@ -341,7 +466,7 @@ async def run_topic_cancel(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_tool_success(client, group, topic_id, timeout_s):
+async def run_topic_tool_success(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-tool-ok-{topic_id}-{int(time.time())}"
     expected = f"OK {nonce}"
     command = f"echo {expected}"
@@ -351,7 +476,7 @@ async def run_topic_tool_success(client, group, topic_id, timeout_s):
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id, expected)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id, expected)
     matched = await collect_matching_messages(client, group, sent.id, nonce, expected_topic_id=topic_id)
     tool_success_seen = any(
         row["text"].startswith("working")
@@ -372,7 +497,7 @@ async def run_topic_tool_success(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_tool_failure(client, group, topic_id, timeout_s):
+async def run_topic_tool_failure(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-tool-fail-{topic_id}-{int(time.time())}"
     expected = f"FAILED {nonce}"
     command = f"sh -c 'echo FAIL {nonce} >&2; exit 7'"
@@ -382,7 +507,7 @@ async def run_topic_tool_failure(client, group, topic_id, timeout_s):
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id, expected)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id, expected)
     matched = await collect_matching_messages(client, group, sent.id, nonce, expected_topic_id=topic_id)
     tool_failure_seen = any(
         row["text"].startswith("working")
@@ -403,7 +528,7 @@ async def run_topic_tool_failure(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_markdown(client, group, topic_id, timeout_s):
+async def run_topic_markdown(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-markdown-{topic_id}-{int(time.time())}"
     prompt = (
         f"{nonce} markdown rendering probe: do not use tools. Reply with a bold "
@@ -411,7 +536,7 @@ async def run_topic_markdown(client, group, topic_id, timeout_s):
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id)
     entity_set = set(reply.get("entity_types") or [])
     ok = (
         nonce in reply.get("text", "")
@@ -430,7 +555,7 @@ async def run_topic_markdown(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_approval(client, group, topic_id, timeout_s):
+async def run_topic_approval(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-approval-{topic_id}-{int(time.time())}"
     expected = f"APPROVED {nonce}"
     command = f"echo {expected}"
@@ -440,10 +565,10 @@ async def run_topic_approval(client, group, topic_id, timeout_s):
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     approval_msg = None
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         matched = await collect_matching_messages(
             client,
             group,
@@ -465,7 +590,7 @@ async def run_topic_approval(client, group, topic_id, timeout_s):
         if approval_msg:
             break
 
-        await asyncio.sleep(2)
+        await poll_pause(activity)
 
     if not approval_msg:
         return {
@@ -481,7 +606,7 @@ async def run_topic_approval(client, group, topic_id, timeout_s):
     message = await client.get_messages(group, ids=approval_msg["id"])
     await message.click(text="Approve once")
 
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id, expected)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id, expected)
     matched = await collect_matching_messages(client, group, sent.id, nonce, expected_topic_id=topic_id)
     edited_approval = await client.get_messages(group, ids=approval_msg["id"])
     approval_recorded = (edited_approval.raw_text or "") == "Approval: approve once"
@@ -506,11 +631,12 @@ async def run_topic_approval(client, group, topic_id, timeout_s):
     }
 
 
-async def run_topic_long_output(client, group, topic_id, timeout_s):
+async def run_topic_long_output(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-long-{topic_id}-{int(time.time())}"
-    line_a = f"{nonce} A " + ("alpha " * 520)
-    line_b = f"{nonce} B " + ("bravo " * 520)
-    line_c = f"{nonce} C " + ("charlie " * 360) + f" END {nonce}"
+    end_marker = f"END {nonce}"
+    line_a = f"{nonce} A {LONG_OUTPUT_FILLER_A}"
+    line_b = f"{nonce} B {LONG_OUTPUT_FILLER_B}"
+    line_c = f"{nonce} C {LONG_OUTPUT_FILLER_C} {end_marker}"
     prompts = [
         f"/echo {nonce} long-output probe part 1:\n{line_a}",
         f"/echo {nonce} long-output probe part 2:\n{line_b}",
@@ -522,12 +648,12 @@ async def run_topic_long_output(client, group, topic_id, timeout_s):
         msg = await client.send_message(group, prompt, reply_to=topic_id)
         sent.append(msg.id)
 
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     matched = []
     answer_rows = []
     combined = ""
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         matched = await collect_matching_messages(
             client,
             group,
@@ -545,19 +671,19 @@ async def run_topic_long_output(client, group, topic_id, timeout_s):
                 and nonce in row["text"]
             )
         ]
-        answer_rows = sorted(answer_rows, key=lambda row: row["id"])
+        answer_rows.sort(key=lambda row: row["id"])
         combined = "\n".join(row["text"] for row in answer_rows)
 
-        if f"END {nonce}" in combined and len(combined) > 4500 and len(answer_rows) >= 2:
+        if end_marker in combined and len(combined) > 4500 and len(answer_rows) >= 2:
             break
 
-        await asyncio.sleep(2)
+        await poll_pause(activity)
 
     chunk_lengths = [len(row["text"]) for row in answer_rows]
     first_replies_to_prompt = bool(answer_rows) and answer_rows[0].get("reply_to_msg_id") in sent
     followups_in_topic = all(row_in_topic(row, topic_id) for row in answer_rows)
     ok = (
-        f"END {nonce}" in combined
+        end_marker in combined
         and len(combined) > 4500
         and len(answer_rows) >= 2
         and first_replies_to_prompt
@@ -575,13 +701,13 @@ async def run_topic_long_output(client, group, topic_id, timeout_s):
         "chunk_lengths": chunk_lengths,
         "first_replies_to_prompt": first_replies_to_prompt,
         "followups_in_topic": followups_in_topic,
-        "saw_end_marker": f"END {nonce}" in combined,
+        "saw_end_marker": end_marker in combined,
         "combined_length": len(combined),
         "matched": matched[:10],
     }
 
 
-async def run_topic_file_get(client, group, topic_id, timeout_s, workdir):
+async def run_topic_file_get(client, activity, group, topic_id, timeout_s, workdir):
     nonce = f"lemon-file-{topic_id}-{int(time.time())}"
     proof_dir = Path(workdir) / "tmp"
     proof_dir.mkdir(parents=True, exist_ok=True)
@@ -591,12 +717,12 @@ async def run_topic_file_get(client, group, topic_id, timeout_s, workdir):
     proof_path.write_text(f"{nonce}\ntelegram file proof\n", encoding="utf-8")
 
     sent = await client.send_message(group, f"/file get {rel_path}", reply_to=topic_id)
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     matched = []
     document = None
 
     try:
-        while time.time() < deadline:
+        while time.monotonic() < deadline:
             matched = await collect_matching_messages(
                 client,
                 group,
@@ -621,7 +747,7 @@ async def run_topic_file_get(client, group, topic_id, timeout_s, workdir):
             if document:
                 break
 
-            await asyncio.sleep(2)
+            await poll_pause(activity)
     finally:
         try:
             proof_path.unlink()
@@ -640,36 +766,38 @@ async def run_topic_file_get(client, group, topic_id, timeout_s, workdir):
     }
 
 
-async def run_topic_generated_media_delivery(client, group, topic_id, timeout_s, bot_username):
-    nonce = f"lemon-generated-media-{topic_id}-{int(time.time())}"
-    filename = f"telegram-generated-media-{nonce}.svg"
-    mention = f"@{str(bot_username).lstrip('@')}"
-    prompt = (
-        f"{mention} {nonce} generated media delivery probe: use the media_generate_image tool with "
-        f"provider local_svg, filename telegram-generated-media-{nonce}, and sendToChannel true. "
-        f"After the tool completes, reply with GENERATED_MEDIA_SENT {nonce}."
-    )
-
-    sent = await client.send_message(group, prompt, reply_to=topic_id)
-    deadline = time.time() + timeout_s
+async def wait_for_delivered_document(
+    client,
+    activity,
+    group,
+    topic_id,
+    sent_id,
+    nonce,
+    filename,
+    marker,
+    timeout_s,
+    forbid_directive=False,
+):
+    deadline = time.monotonic() + timeout_s
     matched = []
     document = None
     marker_seen = False
+    directive_leaked = False
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         matched = await collect_matching_messages(
             client,
             group,
-            sent.id,
+            sent_id,
             nonce,
             limit=100,
             expected_topic_id=topic_id,
         )
 
-        marker_seen = any(
-            not row["out"] and f"GENERATED_MEDIA_SENT {nonce}" in row["text"]
-            for row in matched
-        )
+        marker_seen = any(not row["out"] and marker in row["text"] for row in matched)
+
+        if forbid_directive:
+            directive_leaked = any(not row["out"] and "MEDIA:" in row["text"] for row in matched)
 
         document = next(
             (
@@ -682,10 +810,36 @@ async def run_topic_generated_media_delivery(client, group, topic_id, timeout_s,
             None,
         )
 
-        if marker_seen and document:
+        if marker_seen and document and not directive_leaked:
             break
 
-        await asyncio.sleep(2)
+        await poll_pause(activity)
+
+    return matched, document, marker_seen, directive_leaked
+
+
+async def run_topic_generated_media_delivery(client, activity, group, topic_id, timeout_s, bot_username):
+    nonce = f"lemon-generated-media-{topic_id}-{int(time.time())}"
+    filename = f"telegram-generated-media-{nonce}.svg"
+    mention = f"@{str(bot_username).lstrip('@')}"
+    prompt = (
+        f"{mention} {nonce} generated media delivery probe: use the media_generate_image tool with "
+        f"provider local_svg, filename telegram-generated-media-{nonce}, and sendToChannel true. "
+        f"After the tool completes, reply with GENERATED_MEDIA_SENT {nonce}."
+    )
+
+    sent = await client.send_message(group, prompt, reply_to=topic_id)
+    matched, document, marker_seen, _directive_leaked = await wait_for_delivered_document(
+        client,
+        activity,
+        group,
+        topic_id,
+        sent.id,
+        nonce,
+        filename,
+        f"GENERATED_MEDIA_SENT {nonce}",
+        timeout_s,
+    )
 
     return {
         "name": "telegram_forum_topic_generated_media_delivery",
@@ -700,7 +854,7 @@ async def run_topic_generated_media_delivery(client, group, topic_id, timeout_s,
     }
 
 
-async def run_topic_generated_audio_delivery(client, group, topic_id, timeout_s, bot_username):
+async def run_topic_generated_audio_delivery(client, activity, group, topic_id, timeout_s, bot_username):
     nonce = f"lemon-generated-audio-{topic_id}-{int(time.time())}"
     filename = f"telegram-generated-audio-{nonce}.wav"
     mention = f"@{str(bot_username).lstrip('@')}"
@@ -712,41 +866,17 @@ async def run_topic_generated_audio_delivery(client, group, topic_id, timeout_s,
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    deadline = time.time() + timeout_s
-    matched = []
-    document = None
-    marker_seen = False
-
-    while time.time() < deadline:
-        matched = await collect_matching_messages(
-            client,
-            group,
-            sent.id,
-            nonce,
-            limit=100,
-            expected_topic_id=topic_id,
-        )
-
-        marker_seen = any(
-            not row["out"] and f"GENERATED_AUDIO_SENT {nonce}" in row["text"]
-            for row in matched
-        )
-
-        document = next(
-            (
-                row
-                for row in matched
-                if not row["out"]
-                and row["has_document"]
-                and (row["file_name"] == filename or nonce in str(row["file_name"] or ""))
-            ),
-            None,
-        )
-
-        if marker_seen and document:
-            break
-
-        await asyncio.sleep(2)
+    matched, document, marker_seen, _directive_leaked = await wait_for_delivered_document(
+        client,
+        activity,
+        group,
+        topic_id,
+        sent.id,
+        nonce,
+        filename,
+        f"GENERATED_AUDIO_SENT {nonce}",
+        timeout_s,
+    )
 
     return {
         "name": "telegram_forum_topic_generated_audio_delivery",
@@ -761,7 +891,7 @@ async def run_topic_generated_audio_delivery(client, group, topic_id, timeout_s,
     }
 
 
-async def run_topic_media_directive_delivery(client, group, topic_id, timeout_s, bot_username):
+async def run_topic_media_directive_delivery(client, activity, group, topic_id, timeout_s, bot_username):
     nonce = f"lemon-media-directive-{topic_id}-{int(time.time())}"
     rel_path = f"tmp/telegram-media-directive-{nonce}.txt"
     filename = Path(rel_path).name
@@ -774,43 +904,18 @@ async def run_topic_media_directive_delivery(client, group, topic_id, timeout_s,
     )
 
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    deadline = time.time() + timeout_s
-    matched = []
-    document = None
-    marker_seen = False
-    directive_leaked = False
-
-    while time.time() < deadline:
-        matched = await collect_matching_messages(
-            client,
-            group,
-            sent.id,
-            nonce,
-            limit=100,
-            expected_topic_id=topic_id,
-        )
-
-        marker_seen = any(
-            not row["out"] and f"MEDIA_DIRECTIVE_SENT {nonce}" in row["text"]
-            for row in matched
-        )
-        directive_leaked = any(not row["out"] and "MEDIA:" in row["text"] for row in matched)
-
-        document = next(
-            (
-                row
-                for row in matched
-                if not row["out"]
-                and row["has_document"]
-                and (row["file_name"] == filename or nonce in str(row["file_name"] or ""))
-            ),
-            None,
-        )
-
-        if marker_seen and document and not directive_leaked:
-            break
-
-        await asyncio.sleep(2)
+    matched, document, marker_seen, directive_leaked = await wait_for_delivered_document(
+        client,
+        activity,
+        group,
+        topic_id,
+        sent.id,
+        nonce,
+        filename,
+        f"MEDIA_DIRECTIVE_SENT {nonce}",
+        timeout_s,
+        forbid_directive=True,
+    )
 
     return {
         "name": "telegram_forum_topic_media_directive_delivery",
@@ -836,7 +941,7 @@ def parse_status_id(text, label):
     return match.group(1) if match else None
 
 
-async def run_topic_kanban(client, group, topic_id, timeout_s):
+async def run_topic_kanban(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-kanban-{topic_id}-{int(time.time())}"
     board_name = f"private board {nonce}"
     task_title = f"private task {nonce}"
@@ -847,7 +952,7 @@ async def run_topic_kanban(client, group, topic_id, timeout_s):
         f"/kanban create {board_name}",
         reply_to=topic_id,
     )
-    board_reply = await wait_for_reply(client, group, create_board.id, nonce, timeout_s, topic_id)
+    board_reply = await wait_for_reply(client, activity, group, create_board.id, nonce, timeout_s, topic_id)
     board_id = parse_status_id(board_reply.get("text"), "Board id")
 
     if not board_id:
@@ -866,7 +971,7 @@ async def run_topic_kanban(client, group, topic_id, timeout_s):
         f"/kanban task create {board_id} --priority high {task_title}",
         reply_to=topic_id,
     )
-    task_reply = await wait_for_reply(client, group, create_task.id, nonce, timeout_s, topic_id)
+    task_reply = await wait_for_reply(client, activity, group, create_task.id, nonce, timeout_s, topic_id)
     task_id = parse_status_id(task_reply.get("text"), "Task id")
 
     comment = await client.send_message(
@@ -874,13 +979,13 @@ async def run_topic_kanban(client, group, topic_id, timeout_s):
         f"/kanban comment {task_id or 'missing-task'} {comment_body}",
         reply_to=topic_id,
     )
-    comment_reply = await wait_for_reply(client, group, comment.id, nonce, timeout_s, topic_id)
+    comment_reply = await wait_for_reply(client, activity, group, comment.id, nonce, timeout_s, topic_id)
 
     show = await client.send_message(group, f"/kanban show {board_id}", reply_to=topic_id)
-    show_reply = await wait_for_reply(client, group, show.id, nonce, timeout_s, topic_id)
+    show_reply = await wait_for_reply(client, activity, group, show.id, nonce, timeout_s, topic_id)
 
     archive = await client.send_message(group, f"/kanban archive {board_id}", reply_to=topic_id)
-    archive_reply = await wait_for_reply(client, group, archive.id, nonce, timeout_s, topic_id)
+    archive_reply = await wait_for_reply(client, activity, group, archive.id, nonce, timeout_s, topic_id)
 
     replies = [board_reply, task_reply, comment_reply, show_reply, archive_reply]
     reply_text = "\n".join(row.get("text") or "" for row in replies)
@@ -985,7 +1090,7 @@ def delete_local_checkpoint(checkpoint_id):
     )
 
 
-async def run_topic_checkpoint(client, group, topic_id, timeout_s, workdir):
+async def run_topic_checkpoint(client, activity, group, topic_id, timeout_s, workdir):
     nonce = f"lemon-checkpoint-{topic_id}-{int(time.time())}"
     fixture = create_local_checkpoint(workdir, nonce)
     checkpoint_id = fixture["checkpoint_id"]
@@ -1002,6 +1107,7 @@ async def run_topic_checkpoint(client, group, topic_id, timeout_s, workdir):
         )
         diff_reply = await wait_for_reply(
             client,
+            activity,
             group,
             diff.id,
             checkpoint_id,
@@ -1021,6 +1127,7 @@ async def run_topic_checkpoint(client, group, topic_id, timeout_s, workdir):
         )
         restore_reply = await wait_for_reply(
             client,
+            activity,
             group,
             restore.id,
             checkpoint_id,
@@ -1075,11 +1182,11 @@ async def run_topic_checkpoint(client, group, topic_id, timeout_s, workdir):
             pass
 
 
-async def run_topic_restart_seed(client, group, topic_id, timeout_s):
+async def run_topic_restart_seed(client, activity, group, topic_id, timeout_s):
     nonce = f"lemon-restart-seed-{topic_id}-{int(time.time())}"
     prompt = f"/echo {nonce} restart dedupe seed"
     sent = await client.send_message(group, prompt, reply_to=topic_id)
-    reply = await wait_for_reply(client, group, sent.id, nonce, timeout_s, topic_id)
+    reply = await wait_for_reply(client, activity, group, sent.id, nonce, timeout_s, topic_id)
 
     ok = (
         nonce in reply.get("text", "")
@@ -1100,17 +1207,18 @@ async def run_topic_restart_seed(client, group, topic_id, timeout_s):
 
 async def run_topic_restart_verify(
     client,
+    activity,
     group,
     topic_id,
     timeout_s,
     restart_nonce,
     restart_reply_id,
 ):
-    deadline = time.time() + timeout_s
+    deadline = time.monotonic() + timeout_s
     duplicates = []
     matched = []
 
-    while time.time() < deadline:
+    while time.monotonic() < deadline:
         matched = await collect_matching_messages(
             client,
             group,
@@ -1131,12 +1239,12 @@ async def run_topic_restart_verify(
         if duplicates:
             break
 
-        await asyncio.sleep(2)
+        await poll_pause(activity)
 
     fresh_nonce = f"lemon-restart-after-{topic_id}-{int(time.time())}"
     fresh_prompt = f"/echo {fresh_nonce} post restart prompt"
     sent = await client.send_message(group, fresh_prompt, reply_to=topic_id)
-    fresh_reply = await wait_for_reply(client, group, sent.id, fresh_nonce, timeout_s, topic_id)
+    fresh_reply = await wait_for_reply(client, activity, group, sent.id, fresh_nonce, timeout_s, topic_id)
     fresh_ok = (
         fresh_nonce in fresh_reply.get("text", "")
         and fresh_reply.get("reply_to_msg_id") == sent.id
@@ -1157,7 +1265,7 @@ async def run_topic_restart_verify(
     }
 
 
-async def run_topic_isolation(client, group, topic_ids, timeout_s):
+async def run_topic_isolation(client, activity, group, topic_ids, timeout_s):
     if len(topic_ids) < 2:
         return {
             "name": "telegram_forum_topic_isolation",
@@ -1167,30 +1275,29 @@ async def run_topic_isolation(client, group, topic_ids, timeout_s):
         }
 
     started_at = int(time.time())
-    sent = []
 
-    for topic_id in topic_ids:
+    async def send_probe(topic_id):
         nonce = f"lemon-isolate-{topic_id}-{started_at}"
         prompt = (
             f"{nonce} topic isolation probe: use bash to run "
             f"`sleep 6 && echo OK {nonce}`, then reply with exactly OK {nonce}"
         )
         message = await client.send_message(group, prompt, reply_to=topic_id)
-        sent.append({"topic_id": topic_id, "nonce": nonce, "sent_id": message.id})
+        return {"topic_id": topic_id, "nonce": nonce, "sent_id": message.id}
 
-    replies = []
+    async with asyncio.TaskGroup() as sends:
+        tasks = [sends.create_task(send_probe(topic_id)) for topic_id in topic_ids]
 
-    for item in sent:
-        reply = await wait_for_reply(
-            client,
-            group,
-            item["sent_id"],
-            item["nonce"],
-            timeout_s,
-            item["topic_id"],
-            f"OK {item['nonce']}",
-        )
-        replies.append({**item, "reply": reply})
+    sent = [task.result() for task in tasks]
+
+    probes = [
+        (item["sent_id"], item["nonce"], item["topic_id"], f"OK {item['nonce']}")
+        for item in sent
+    ]
+    replies = [
+        {**item, "reply": reply}
+        for item, reply in zip(sent, await wait_for_replies(client, activity, group, probes, timeout_s))
+    ]
 
     ok = all(
         item["reply"].get("text") == f"OK {item['nonce']}"
@@ -1207,6 +1314,22 @@ async def run_topic_isolation(client, group, topic_ids, timeout_s):
     }
 
 
+def run_result(args, checks):
+    return {
+        "ok": all(check["ok"] for check in checks),
+        "bot": args.bot,
+        "group": args.group,
+        "checks": checks,
+    }
+
+
+def write_result_file(path, result):
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(output + "\n")
+    return output
+
+
 async def run(args):
     cfg = load_env(args.credentials)
     require_config(cfg, args.credentials)
@@ -1217,133 +1340,152 @@ async def run(args):
         if not await client.is_user_authorized():
             raise SystemExit("Telegram session is not authorized.")
 
-        bot = await client.get_entity(args.bot)
-        group = await client.get_entity(int(args.group))
+        bot, group = await asyncio.gather(
+            client.get_entity(args.bot),
+            client.get_entity(int(args.group)),
+        )
+        with watch_activity(client, [bot, group], bot) as activity:
+            checks = []
 
-        checks = []
+            def record(check):
+                checks.append(check)
 
-        if not args.skip_dm:
-            checks.append(await run_dm(client, bot, args.timeout))
+                # Checkpoint after each check so an interrupted run keeps what it
+                # proved; a partial result never reports ok, only the final write can.
+                if args.result_path:
+                    write_result_file(args.result_path, {**run_result(args, checks), "ok": False, "partial": True})
 
-        topic_ids = args.topic_id or [DEFAULT_TOPIC]
+            if not args.skip_dm:
+                record(await run_dm(client, activity, bot, args.timeout))
 
-        if not args.skip_topic:
-            for topic_id in topic_ids:
-                checks.append(await run_topic(client, group, topic_id, args.timeout))
+            topic_ids = args.topic_id or [DEFAULT_TOPIC]
 
-        if args.topic_isolation:
-            isolation_topic_ids = args.isolation_topic_id or DEFAULT_ISOLATION_TOPICS
-            checks.append(
-                await run_topic_isolation(client, group, isolation_topic_ids, args.timeout)
-            )
+            if not args.skip_topic:
+                # Each distinct topic is its own conversation, so the round trips can overlap.
+                async with asyncio.TaskGroup() as round_trips:
+                    tasks = [
+                        round_trips.create_task(run_topic(client, activity, group, topic_id, args.timeout))
+                        for topic_id in dict.fromkeys(topic_ids)
+                    ]
 
-        if args.topic_cancel:
-            checks.append(await run_topic_cancel(client, group, args.cancel_topic_id, args.timeout))
+                for task in tasks:
+                    record(task.result())
 
-        if args.topic_tool_rendering:
-            checks.append(await run_topic_tool_success(client, group, args.tool_topic_id, args.timeout))
-            checks.append(await run_topic_tool_failure(client, group, args.tool_topic_id, args.timeout))
+            if args.topic_isolation:
+                isolation_topic_ids = args.isolation_topic_id or DEFAULT_ISOLATION_TOPICS
+                record(
+                    await run_topic_isolation(client, activity, group, isolation_topic_ids, args.timeout)
+                )
 
-        if args.topic_markdown:
-            checks.append(await run_topic_markdown(client, group, args.markdown_topic_id, args.timeout))
+            if args.topic_cancel:
+                record(await run_topic_cancel(client, activity, group, args.cancel_topic_id, args.timeout))
 
-        if args.topic_approval:
-            checks.append(await run_topic_approval(client, group, args.approval_topic_id, args.timeout))
+            if args.topic_tool_rendering:
+                record(await run_topic_tool_success(client, activity, group, args.tool_topic_id, args.timeout))
+                record(await run_topic_tool_failure(client, activity, group, args.tool_topic_id, args.timeout))
 
-        if args.topic_long_output:
-            checks.append(
-                await run_topic_long_output(client, group, args.long_output_topic_id, args.timeout)
-            )
+            if args.topic_markdown:
+                record(await run_topic_markdown(client, activity, group, args.markdown_topic_id, args.timeout))
+
+            if args.topic_approval:
+                record(await run_topic_approval(client, activity, group, args.approval_topic_id, args.timeout))
 
-        if args.topic_file_get:
-            checks.append(
-                await run_topic_file_get(
-                    client,
-                    group,
-                    args.file_get_topic_id,
-                    args.timeout,
-                    args.workdir,
+            if args.topic_long_output:
+                record(
+                    await run_topic_long_output(client, activity, group, args.long_output_topic_id, args.timeout)
                 )
-            )
 
-        if args.topic_generated_media_delivery:
-            checks.append(
-                await run_topic_generated_media_delivery(
-                    client,
-                    group,
-                    args.generated_media_topic_id,
-                    args.timeout,
-                    args.bot,
+            if args.topic_file_get:
+                record(
+                    await run_topic_file_get(
+                        client,
+                        activity,
+                        group,
+                        args.file_get_topic_id,
+                        args.timeout,
+                        args.workdir,
+                    )
                 )
-            )
 
-        if args.topic_generated_audio_delivery:
-            checks.append(
-                await run_topic_generated_audio_delivery(
-                    client,
-                    group,
-                    args.generated_audio_topic_id,
-                    args.timeout,
-                    args.bot,
+            if args.topic_generated_media_delivery:
+                record(
+                    await run_topic_generated_media_delivery(
+                        client,
+                        activity,
+                        group,
+                        args.generated_media_topic_id,
+                        args.timeout,
+                        args.bot,
+                    )
                 )
-            )
 
-        if args.topic_media_directive_delivery:
-            checks.append(
-                await run_topic_media_directive_delivery(
-                    client,
-                    group,
-                    args.media_directive_topic_id,
-                    args.timeout,
-                    args.bot,
+            if args.topic_generated_audio_delivery:
+                record(
+                    await run_topic_generated_audio_delivery(
+                        client,
+                        activity,
+                        group,
+                        args.generated_audio_topic_id,
+                        args.timeout,
+                        args.bot,
+                    )
                 )
-            )
 
-        if args.topic_kanban:
-            checks.append(await run_topic_kanban(client, group, args.kanban_topic_id, args.timeout))
-
-        if args.topic_checkpoint:
-            checks.append(
-                await run_topic_checkpoint(
-                    client,
-                    group,
-                    args.checkpoint_topic_id,
-                    args.timeout,
-                    args.workdir,
+            if args.topic_media_directive_delivery:
+                record(
+                    await run_topic_media_directive_delivery(
+                        client,
+                        activity,
+                        group,
+                        args.media_directive_topic_id,
+                        args.timeout,
+                        args.bot,
+                    )
                 )
-            )
 
-        if args.topic_restart_seed:
-            checks.append(
-                await run_topic_restart_seed(
-                    client,
-                    group,
-                    args.restart_topic_id,
-                    args.timeout,
+            if args.topic_kanban:
+                record(await run_topic_kanban(client, activity, group, args.kanban_topic_id, args.timeout))
+
+            if args.topic_checkpoint:
+                record(
+                    await run_topic_checkpoint(
+                        client,
+                        activity,
+                        group,
+                        args.checkpoint_topic_id,
+                        args.timeout,
+                        args.workdir,
+                    )
                 )
-            )
 
-        if args.topic_restart_verify:
-            if not args.restart_nonce:
-                raise SystemExit("--restart-nonce is required with --topic-restart-verify")
-
-            checks.append(
-                await run_topic_restart_verify(
-                    client,
-                    group,
-                    args.restart_topic_id,
-                    args.timeout,
-                    args.restart_nonce,
-                    args.restart_reply_id,
+            if args.topic_restart_seed:
+                record(
+                    await run_topic_restart_seed(
+                        client,
+                        activity,
+                        group,
+                        args.restart_topic_id,
+                        args.timeout,
+                    )
                 )
-            )
 
-    return {
-        "ok": all(check["ok"] for check in checks),
-        "bot": args.bot,
-        "group": args.group,
-        "checks": checks,
-    }
+            if args.topic_restart_verify:
+                if not args.restart_nonce:
+                    raise SystemExit("--restart-nonce is required with --topic-restart-verify")
+
+                record(
+                    await run_topic_restart_verify(
+                        client,
+                        activity,
+                        group,
+                        args.restart_topic_id,
+                        args.timeout,
+                        args.restart_nonce,
+                        args.restart_reply_id,
+                    )
+                )
+
+    return run_result(args, checks)
 
 
 def parser():
@@ -1395,14 +1537,15 @@ def main():
     result = asyncio.run(run(args))
 
     if args.result_path:
-        args.result_path.parent.mkdir(parents=True, exist_ok=True)
-        args.result_path.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n")
+        output = write_result_file(args.result_path, result)
+    else:
+        output = json.dumps(result, indent=2, ensure_ascii=False)
 
     if args.proof_path:
         args.proof_path.parent.mkdir(parents=True, exist_ok=True)
         args.proof_path.write_text(json.dumps(sanitized_live_proof(result), indent=2) + "\n")
 
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(output)
     raise SystemExit(0 if result["ok"] else 1)
 
 
@@ -34,6 +34,7 @@ API_HASH = creds["TELEGRAM_API_HASH"]
 SESSION_STRING = creds["TELEGRAM_SESSION_STRING"]
 
 BOTFATHER_USERNAME = "BotFather"
+BOTFATHER_REPLY_TIMEOUT = 30
 
 
 async def main():
@@ -51,30 +52,35 @@ async def main():
 
     print(f"\nCreating bot: {bot_name} (@{bot_username})")
 
-    # Send /newbot to BotFather
-    print("Sending /newbot to BotFather...")
-    await client.send_message(BOTFATHER_USERNAME, "/newbot")
-    await asyncio.sleep(2)
-
-    # Send the bot name
-    print(f"Sending bot name: {bot_name}")
-    await client.send_message(BOTFATHER_USERNAME, bot_name)
-    await asyncio.sleep(2)
-
-    # Send the bot username
-    print(f"Sending bot username: {bot_username}")
-    await client.send_message(BOTFATHER_USERNAME, bot_username)
-    await asyncio.sleep(3)
-
-    # Get the response with the token
-    print("Waiting for BotFather response...")
-    messages = await client.get_messages(BOTFATHER_USERNAME, limit=5)
+    # Each step waits for BotFather's reply instead of sleeping a fixed delay;
+    # replies are kept newest first, and the last one carries the token.
+    replies = []
+    try:
+        async with client.conversation(BOTFATHER_USERNAME, timeout=BOTFATHER_REPLY_TIMEOUT) as conv:
+            # Send /newbot to BotFather
+            print("Sending /newbot to BotFather...")
+            await conv.send_message("/newbot")
+            replies.insert(0, await conv.get_response())
+
+            # Send the bot name
+            print(f"Sending bot name: {bot_name}")
+            await conv.send_message(bot_name)
+            replies.insert(0, await conv.get_response())
+
+            # Send the bot username
+            print(f"Sending bot username: {bot_username}")
+            await conv.send_message(bot_username)
+            replies.insert(0, await conv.get_response())
+    except asyncio.TimeoutError:
+        print(f"BotFather did not reply within {BOTFATHER_REPLY_TIMEOUT}s")
 
     bot_token = None
-    for msg in messages:
-        if msg.text and "HTTP API" in msg.text:
+    for msg in replies:
+        # raw_text skips re-rendering BotFather's entities back into markdown
+        text = msg.raw_text
+        if text and "HTTP API" in text:
             # Extract token - format is like 123456789:ABCdefGHIjklMNOpqrsTUVwxyz
-            match = re.search(r'(\d+:[A-Za-z0-9_-]+)', msg.text)
+            match = re.search(r'(\d+:[A-Za-z0-9_-]+)', text)
             if match:
                 bot_token = match.group(1)
                 print(f"\nBot token: {bot_token}")
@@ -83,8 +89,8 @@ async def main():
     if not bot_token:
         print("ERROR: Could not extract bot token from BotFather response")
         print("Last messages from BotFather:")
-        for msg in messages[:3]:
-            print(f"  - {msg.text[:200] if msg.text else '(no text)'}...")
+        for msg in replies[:3]:
+            print(f"  - {msg.raw_text[:200] if msg.raw_text else '(no text)'}...")
         await client.disconnect()
         return
 